@@ -1,9 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import hashlib
+import importlib.util
+import io
+import time
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
+from pathlib import Path
+
+from config import PERFORMANCE
+from data_processor import seconds_to_time_str, time_col_to_seconds
 
 
 st.set_page_config(
@@ -33,48 +39,77 @@ if 'selected_main' not in st.session_state:
     st.session_state.selected_main = None
 if 'selected_sub' not in st.session_state:
     st.session_state.selected_sub = []
-
-
-
-def time_str_to_seconds(time_str):
-    """Convert HH:MM:SS to seconds"""
-    if pd.isna(time_str):
-        return 0
-    try:
-        parts = str(time_str).split(':')
-        if len(parts) == 3:
-            h, m, s = map(int, parts)
-            return h * 3600 + m * 60 + s
-    except:
-        pass
-    return 0
-
-def seconds_to_time_str(seconds):
-    """Convert seconds to HH:MM:SS"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-
-def time_str_to_hours(time_str):
-    """Convert HH:MM:SS to decimal hours"""
-    return time_str_to_seconds(time_str) / 3600
-
-
-
-def find_column_by_keywords(df, keywords):
+if 'data_key' not in st.session_state:
+    st.session_state.data_key = None
+if 'upload_id' not in st.session_state:
+    st.session_state.upload_id = None
+if 'main_index' not in st.session_state:
+    st.session_state.main_index = {}
+if 'sub_by_main' not in st.session_state:
+    st.session_state.sub_by_main = {}
+if 'summary_cache' not in st.session_state:
+    st.session_state.summary_cache = pd.DataFrame()
+if 'last_filtered' not in st.session_state:
+    st.session_state.last_filtered = None
+if 'export_key' not in st.session_state:
+    st.session_state.export_key = None
+
+
+
+# Numeric copies of detected columns, computed once per upload
+TIME_SHADOW_COLUMNS = {
+    'prep_time': '_prep_s',
+    'activity_time': '_activity_s',
+    'total_time': '_total_s',
+}
+MANPOWER_SHADOW_COLUMN = '_manpower_num'
+
+def add_shadow_columns(df, cols_dict):
+    """Precompute seconds / numeric manpower columns so views never re-parse strings"""
+    for key, shadow_col in TIME_SHADOW_COLUMNS.items():
+        col_name = cols_dict.get(key)
+        if col_name and col_name in df.columns:
+            seconds = time_col_to_seconds(df[col_name]).round()
+            # int32 halves the column; cells beyond ~596,523 h would wrap, so keep int64 then
+            fits_int32 = seconds.abs().max() <= np.iinfo('int32').max if len(seconds) else True
+            df[shadow_col] = seconds.astype('int32' if fits_int32 else 'int64')
+    
+    manpower_col = cols_dict.get('manpower')
+    if manpower_col and manpower_col in df.columns:
+        # float32 halves the column size and keeps NaN for blank / text cells
+        df[MANPOWER_SHADOW_COLUMN] = pd.to_numeric(df[manpower_col], errors='coerce').astype('float32')
+    
+    return df
+
+def display_columns(df):
+    """Columns to show / export - everything except the shadow columns"""
+    shadow = set(TIME_SHADOW_COLUMNS.values()) | {MANPOWER_SHADOW_COLUMN}
+    return [c for c in df.columns if c not in shadow]
+
+
+
+def normalize_headers(columns):
+    """Collapse runs of whitespace/newlines in text headers into single spaces"""
+    normalized = [' '.join(c.split()) if isinstance(c, str) else c for c in columns]
+    # Keep the original names if normalizing would make two headers collide
+    return normalized if len(set(normalized)) == len(normalized) else list(columns)
+
+def lowered_columns(df):
+    """Pair each column with its lower-cased, stripped name (computed once per df)"""
+    return [(str(c).lower().strip(), c) for c in df.columns]
+
+def find_column_by_keywords(col_lower, keywords):
     """
     Find a column that contains any of the keywords.
+    col_lower: output of lowered_columns(df)
     Keywords: list of strings to search for
     Returns: column name or None
     """
-    col_names = df.columns.tolist()
-    col_lower = [str(c).lower().strip() for c in col_names]
-    
     for keyword in keywords:
-        for i, col_lower_name in enumerate(col_lower):
-            if keyword.lower() in col_lower_name:
-                return col_names[i]
+        keyword = keyword.lower()
+        match = next((col for name, col in col_lower if keyword in name), None)
+        if match is not None:
+            return match
     return None
 
 def detect_columns(df):
@@ -92,66 +127,211 @@ def detect_columns(df):
         'manpower': None
     }
     
+    # Lower-case the headers once instead of once per keyword list
+    col_lower = lowered_columns(df)
+    
     # Find main component column
     columns_found['main'] = find_column_by_keywords(
-        df, 
+        col_lower,
         ['module', 'main', 'category']
     )
     
     # Find sub component column
     columns_found['sub'] = find_column_by_keywords(
-        df,
+        col_lower,
         ['sub', 'sub_module', 'submodule', 'group']
     )
     
     # Find component column (try multiple keywords)
     columns_found['component'] = find_column_by_keywords(
-        df,
+        col_lower,
         ['component', 'item', 'name', 'equipment', 'device']
     )
     
     # Find prep time column
     columns_found['prep_time'] = find_column_by_keywords(
-        df,
+        col_lower,
         ['prep', 'preparation', 'setup', 'finalization']
     )
     
     # Find activity time column
     columns_found['activity_time'] = find_column_by_keywords(
-        df,
+        col_lower,
         ['activity', 'work', 'execution', 'action']
     )
     
     # Find total time column
     columns_found['total_time'] = find_column_by_keywords(
-        df,
+        col_lower,
         ['total', 'total_time', 'duration']
     )
     
     # Find manpower column
     columns_found['manpower'] = find_column_by_keywords(
-        df,
+        col_lower,
         ['man', 'power', 'personnel', 'people', 'workers', 'staff']
     )
     
     return columns_found
 
+# Parsed uploads are also kept on disk so re-uploads skip Excel parsing. Uploads hold
+# customer data, so they go in a per-user 0700 directory rather than the shared tmp.
+PARQUET_CACHE_DIR = Path.home() / '.cache' / 'kone_maintenance'
+
+# Bump whenever parse_excel's output changes (columns, dtypes, shadow columns) -
+# files from older versions are then never read and get deleted on the next write
+PARQUET_CACHE_VERSION = 4
+
+def parquet_cache_path(data_key):
+    """Disk cache file for one upload under the current cache version"""
+    return PARQUET_CACHE_DIR / f"kone_v{PARQUET_CACHE_VERSION}_{data_key}.parquet"
+
+def prune_parquet_cache():
+    """Delete cache files from older versions, past the TTL, or beyond the newest N"""
+    now = time.time()
+    current_prefix = f"kone_v{PARQUET_CACHE_VERSION}_"
+    entries = []
+    for path in PARQUET_CACHE_DIR.glob('kone_*'):
+        try:
+            mtime = path.stat().st_mtime
+            if not path.name.startswith(current_prefix) or now - mtime > PERFORMANCE['cache_ttl']:
+                path.unlink()
+            elif path.suffix == '.parquet':
+                entries.append((mtime, path))
+        except OSError:
+            pass  # Removed by another session meanwhile
+    
+    entries.sort(reverse=True)
+    for _, path in entries[PERFORMANCE['disk_cache_entries']:]:
+        path.unlink(missing_ok=True)
+
+# calamine (Rust) is much faster; without it pandas picks openpyxl, which it already
+# opens read_only / data_only so styles and formulas are never loaded
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
+
+def make_arrow_safe(df):
+    """Stringify mixed-type object columns (Arrow/Parquet can't store them as-is)"""
+    for col_name in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col_name], skipna=True) in ('mixed', 'mixed-integer'):
+            values = df[col_name]
+            df[col_name] = values.where(values.isna(), values.astype(str))
+    return df
+
+@st.cache_data(show_spinner=False, ttl=PERFORMANCE['cache_ttl'])
+def parse_excel(data_key, _file_bytes):
+    """Parse Excel bytes and detect columns - cached per file hash, in memory and as Parquet"""
+    cache_path = parquet_cache_path(data_key)
+    if cache_path.exists():
+        try:
+            df = pd.read_parquet(cache_path)
+            cache_path.touch()  # Recently used - evicted last
+            return df, df.attrs['columns_dict']
+        except Exception:
+            pass  # Unreadable cache file - parse the workbook again
+    
+    # Every column is kept - S.no, remarks etc. still show in the previews and export.
+    # Arrow-backed dtypes - string compares/isin/unique run in native kernels
+    df = pd.read_excel(io.BytesIO(_file_bytes), engine=EXCEL_ENGINE, dtype_backend='pyarrow')
+    df.columns = normalize_headers(df.columns)
+    cols_dict = detect_columns(df)
+    
+    # Store main/sub as string categories - filters then compare integer codes
+    for key in ('main', 'sub'):
+        col_name = cols_dict[key]
+        if col_name and col_name in df.columns:
+            values = df[col_name].astype(object)  # Arrow ints would keep their type through where()
+            values = values.where(values.isna(), values.astype(str)).astype('category')
+            
+            # Forward fill blanks (merged cells) - on a categorical this pads the integer codes
+            df[col_name] = values.ffill() if values.isna().any() else values
+    
+    df = add_shadow_columns(df, cols_dict)
+    df = make_arrow_safe(df)
+    
+    # Best-effort disk cache - a failed write only means the next upload re-parses
+    try:
+        df.attrs['columns_dict'] = cols_dict
+        PARQUET_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        df.to_parquet(tmp_path, compression='zstd')
+        tmp_path.replace(cache_path)
+        prune_parquet_cache()
+    except Exception:
+        pass
+    
+    return df, cols_dict
+
+def unique_sorted_str(series):
+    """Sorted unique non-null values as strings - dedupe/cast/sort all in pandas"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Observed categories straight from the integer codes - no per-value hashing
+        codes = np.unique(series.cat.codes.to_numpy())
+        uniques = pd.Series(series.cat.categories.take(codes[codes >= 0]))
+    else:
+        uniques = pd.Series(series.dropna().unique())
+    return uniques.astype(str).drop_duplicates().sort_values().tolist()
+
+def build_main_index(df, cols_dict):
+    """
+    Build lookups once per upload so selection changes don't rescan the frame.
+    Returns: ({main_value: row positions}, {main_value: sorted sub values})
+    """
+    main_col = cols_dict.get('main')
+    if not main_col or main_col not in df.columns:
+        return {}, {}
+    
+    main_index = df.groupby(main_col, observed=True, sort=False).indices
+    
+    sub_by_main = {}
+    sub_col = cols_dict.get('sub')
+    if sub_col and sub_col in df.columns:
+        for main_value, positions in main_index.items():
+            sub_by_main[main_value] = unique_sorted_str(df[sub_col].take(positions))
+    
+    return main_index, sub_by_main
+
+def build_category_summary(df, cols_dict):
+    """Records and manpower per main category - computed once per upload"""
+    main_col = cols_dict.get('main')
+    if not main_col or main_col not in df.columns:
+        return pd.DataFrame()
+    
+    aggregations = {'Records': (main_col, 'size')}
+    if MANPOWER_SHADOW_COLUMN in df.columns:
+        aggregations['Manpower'] = (MANPOWER_SHADOW_COLUMN, 'sum')
+    
+    # One grouped pass for every column of the table
+    summary = df.groupby(main_col, observed=True).agg(**aggregations)
+    summary['Manpower'] = summary['Manpower'].astype(int) if 'Manpower' in summary else 0
+    
+    summary.index = summary.index.astype(str)
+    return summary.rename_axis('Category').reset_index()
+
 def load_excel(uploaded_file):
-    """Load Excel file and detect columns"""
+    """Load Excel file and detect columns (only re-parses when the file changes)"""
     try:
-        df = pd.read_excel(uploaded_file)
+        # Same uploader value as the previous rerun - don't even read or hash the bytes
+        if st.session_state.upload_id == uploaded_file.file_id and st.session_state.data is not None:
+            return st.session_state.data, st.session_state.columns_dict
         
-        # Forward fill main and sub columns to handle NaN values
-        cols_dict = detect_columns(df)
+        file_bytes = uploaded_file.getvalue()
+        data_key = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
         
-        if cols_dict['main'] and cols_dict['main'] in df.columns:
-            df[cols_dict['main']] = df[cols_dict['main']].fillna(method='ffill')
+        # Same content re-uploaded - keep the stable session DataFrame
+        if st.session_state.data_key == data_key and st.session_state.data is not None:
+            st.session_state.upload_id = uploaded_file.file_id
+            return st.session_state.data, st.session_state.columns_dict
         
-        if cols_dict['sub'] and cols_dict['sub'] in df.columns:
-            df[cols_dict['sub']] = df[cols_dict['sub']].fillna(method='ffill')
+        df, cols_dict = parse_excel(data_key, file_bytes)
+        main_index, sub_by_main = build_main_index(df, cols_dict)
         
         st.session_state.data = df
         st.session_state.columns_dict = cols_dict
+        st.session_state.main_index = main_index
+        st.session_state.sub_by_main = sub_by_main
+        st.session_state.summary_cache = build_category_summary(df, cols_dict)
+        st.session_state.data_key = data_key
+        st.session_state.upload_id = uploaded_file.file_id
         st.session_state.upload_timestamp = datetime.now()
         
         return df, cols_dict
@@ -159,36 +339,24 @@ def load_excel(uploaded_file):
         st.error(f"❌ Error loading file: {str(e)}")
         return None, {}
 
-def get_main_values(df, col_dict):
-    """Get unique main values - with error handling"""
-    if df is None or col_dict.get('main') is None:
+@st.cache_data(show_spinner=False, ttl=PERFORMANCE['cache_ttl'], max_entries=32)
+def get_main_values(data_key, _df, col_dict):
+    """Get unique main values - cached per upload"""
+    if _df is None or col_dict.get('main') is None:
         return []
     
     try:
         col_name = col_dict['main']
-        if col_name in df.columns:
-            return sorted([str(x) for x in df[col_name].dropna().unique()])
+        if col_name in _df.columns:
+            return unique_sorted_str(_df[col_name])
     except Exception as e:
         st.error(f"Error getting main values: {str(e)}")
     
     return []
 
-def get_sub_values(df, col_dict, main_value):
-    """Get unique sub values - with error handling"""
-    if df is None or col_dict.get('main') is None or col_dict.get('sub') is None:
-        return []
-    
-    try:
-        main_col = col_dict['main']
-        sub_col = col_dict['sub']
-        
-        if main_col in df.columns and sub_col in df.columns:
-            filtered = df[df[main_col].astype(str) == str(main_value)]
-            return sorted([str(x) for x in filtered[sub_col].dropna().unique()])
-    except Exception as e:
-        st.error(f"Error getting sub values: {str(e)}")
-    
-    return []
+def get_sub_values(main_value):
+    """Get unique sub values - O(1) lookup in the index built at upload"""
+    return st.session_state.sub_by_main.get(str(main_value), [])
 
 def filter_data(df, col_dict, main_value, sub_values):
     
@@ -196,51 +364,182 @@ def filter_data(df, col_dict, main_value, sub_values):
         return None
     
     try:
-        main_col = col_dict['main']
+        # Start from the main value's rows in the precomputed index
+        positions = st.session_state.main_index.get(str(main_value))
+        if positions is None:
+            return df.iloc[0:0]
         
-        # Filter by main value
-        filtered = df[df[main_col].astype(str) == str(main_value)].copy()
-        
-        # Filter by sub values if they exist
+        # Narrow the positions by sub value, then materialize the frame once
         if sub_values and col_dict.get('sub') and col_dict['sub'] in df.columns:
-            sub_col = col_dict['sub']
-            filtered = filtered[filtered[sub_col].astype(str).isin([str(v) for v in sub_values])]
+            sub_mask = df[col_dict['sub']].take(positions).isin(set(sub_values)).to_numpy()
+            positions = positions[sub_mask]
         
-        return filtered
+        return df.take(positions)
     except Exception as e:
         st.error(f"Error filtering data: {str(e)}")
         return None
 
-def calculate_stats(df, col_dict):
-    """Calculate statistics safely"""
-    if df is None or df.empty:
-        return {}
+def current_selection_key():
+    """Identity of the loaded file + main/sub selection, used as a cache key"""
+    # Sorted: picking the same subs in another order selects the same rows
+    return (
+        st.session_state.data_key,
+        st.session_state.selected_main,
+        tuple(sorted(st.session_state.selected_sub))
+    )
+
+def get_filtered_selection():
+    """Rows for the current selection - filtered once, shared by the sidebar and views"""
+    key = current_selection_key()
+    cached = st.session_state.last_filtered
+    if cached is not None and cached[0] == key:
+        return cached[1]
     
+    filtered = filter_data(
+        st.session_state.data,
+        st.session_state.columns_dict,
+        st.session_state.selected_main,
+        st.session_state.selected_sub
+    )
+    if filtered is not None:
+        st.session_state.last_filtered = (key, filtered)
+    return filtered
+
+# One small dict per selection - more entries than the per-upload caches
+@st.cache_data(show_spinner=False, ttl=PERFORMANCE['cache_ttl'], max_entries=256)
+def calculate_stats(selection_key, _df, col_dict):
+    """Calculate statistics safely - cached per (upload, main, subs) selection"""
+    # Zeroed totals for an empty selection / headers-only workbook
     stats = {
-        'records': len(df),
+        'records': 0 if _df is None else len(_df),
         'total_time': 0,
         'total_manpower': 0,
         'avg_manpower': 0,
     }
+    if _df is None or _df.empty:
+        return stats
     
-    try:
-        if col_dict.get('total_time') and col_dict['total_time'] in df.columns:
-            total_secs = sum(time_str_to_seconds(t) for t in df[col_dict['total_time']])
-            stats['total_time'] = total_secs
-    except:
-        pass
+    if '_total_s' in _df.columns:
+        stats['total_time'] = int(_df['_total_s'].sum())
     
-    try:
-        if col_dict.get('manpower') and col_dict['manpower'] in df.columns:
-            manpower = pd.to_numeric(df[col_dict['manpower']], errors='coerce').dropna()
-            if len(manpower) > 0:
-                stats['total_manpower'] = int(manpower.sum())
-                stats['avg_manpower'] = manpower.mean()
-    except:
-        pass
+    if MANPOWER_SHADOW_COLUMN in _df.columns:
+        manpower = _df[MANPOWER_SHADOW_COLUMN]
+        if manpower.count() > 0:
+            stats['total_manpower'] = int(manpower.sum())
+            stats['avg_manpower'] = float(manpower.mean())
     
     return stats
 
+# Above this many rows the charts aggregate / switch to WebGL
+MAX_CHART_BARS = 200
+
+# Rows sent to the browser for table previews; the CSV export has the rest
+PREVIEW_ROWS = PERFORMANCE['max_rows_display']
+
+def show_preview(df, height, key):
+    """Render up to PREVIEW_ROWS rows of df (all on request) without the shadow columns"""
+    show_all = False
+    if len(df) > PREVIEW_ROWS:
+        show_all = st.toggle(f"Show all {len(df)} rows", key=key)
+    
+    rows = df if show_all else df.head(PREVIEW_ROWS)
+    st.dataframe(rows[display_columns(df)], use_container_width=True, height=height, hide_index=True)
+    if not show_all and len(df) > PREVIEW_ROWS:
+        st.caption(f"Showing first {PREVIEW_ROWS} of {len(df)} rows - download CSV for full data")
+
+def split_top_rows(df, rank, max_rows=MAX_CHART_BARS):
+    """Split df into the max_rows rows with the largest rank values and the rest"""
+    if len(df) <= max_rows:
+        return df, df.iloc[0:0]
+    
+    order = np.argsort(-np.asarray(rank), kind='stable')
+    return df.iloc[order[:max_rows]], df.iloc[order[max_rows:]]
+
+def sum_by_component(df, component_col, columns):
+    """Collapse rows that share a component name into one summed row"""
+    grouped = df.groupby(component_col, sort=False, observed=True, dropna=False)[columns]
+    return grouped.sum(min_count=1).reset_index()
+
+# Figures are cached as shared objects (cache_resource): cache_data would unpickle a
+# fresh copy of the Figure on every rerun, which costs more than drawing it. Callers
+# only pass them to st.plotly_chart and must not mutate them.
+@st.cache_resource(show_spinner=False, max_entries=32)
+def build_time_figure(selection_key, _df, col_dict):
+    """Stacked preparation/activity bar chart - cached per selection"""
+    import plotly.graph_objects as go  # Deferred: Table View never needs plotly
+    
+    component_col = col_dict.get('component', 'Item')
+    if len(_df) > MAX_CHART_BARS and component_col in _df.columns:
+        _df = sum_by_component(_df, component_col, ['_prep_s', '_activity_s'])
+    
+    # Plot the largest items and fold the long tail into one "Other" bar
+    top, rest = split_top_rows(_df, _df['_prep_s'] + _df['_activity_s'])
+    prep = top['_prep_s'].to_numpy() / 3600
+    activity = top['_activity_s'].to_numpy() / 3600
+    
+    x_axis = top[component_col] if component_col in top.columns else range(len(top))
+    
+    if len(rest) > 0:
+        x_axis = [str(x) for x in x_axis] + [f"Other ({len(rest)} items)"]
+        prep = np.append(prep, rest['_prep_s'].sum() / 3600)
+        activity = np.append(activity, rest['_activity_s'].sum() / 3600)
+    
+    fig = go.Figure(data=[
+        go.Bar(name='Preparation', x=x_axis, y=prep),
+        go.Bar(name='Activity', x=x_axis, y=activity)
+    ])
+    
+    # Same selection -> same uirevision, so the client keeps zoom/pan state
+    fig.update_layout(barmode='stack', height=500, hovermode='x unified', uirevision=str(selection_key))
+    return fig
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def build_manpower_figure(selection_key, _df, col_dict):
+    """Manpower per item chart - cached per selection"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    component_col = col_dict.get('component', 'Item')
+    if len(_df) > MAX_CHART_BARS and component_col in _df.columns:
+        _df = sum_by_component(_df, component_col, [MANPOWER_SHADOW_COLUMN])
+    x_axis = _df[component_col] if component_col in _df.columns else range(len(_df))
+    
+    manpower = _df[MANPOWER_SHADOW_COLUMN]
+    
+    if len(_df) > MAX_CHART_BARS:
+        # Too many bars for SVG - draw WebGL markers instead
+        fig = go.Figure(go.Scattergl(
+            x=x_axis,
+            y=manpower,
+            mode='markers',
+            marker=dict(color=manpower, colorscale='Viridis', showscale=True)
+        ))
+        fig.update_layout(title="Manpower Needed")
+    else:
+        fig = px.bar(
+            x=x_axis,
+            y=manpower,
+            title="Manpower Needed",
+            color=manpower,
+            color_continuous_scale='Viridis'
+        )
+    fig.update_layout(height=500, uirevision=str(selection_key))
+    return fig
+
+def iter_csv(df, columns=None, chunksize=50_000):
+    """Yield CSV bytes chunk by chunk instead of building one big string"""
+    columns = columns if columns is not None else list(df.columns)
+    yield df.iloc[:0].to_csv(index=False, columns=columns).encode()
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        yield chunk.to_csv(index=False, header=False, columns=columns).encode()
+
+# Bounded: each entry holds a full CSV, shared by every session in the process
+@st.cache_data(show_spinner=False, ttl=PERFORMANCE['cache_ttl'], max_entries=32)
+def selection_csv(selection_key, _df):
+    """CSV export bytes - serialized once per selection"""
+    return b"".join(iter_csv(_df, columns=display_columns(_df)))
+
 # ============================================================================
 # SIDEBAR
 # ============================================================================
@@ -287,21 +586,22 @@ with st.sidebar:
         st.session_state.selected_sub and 
         st.session_state.columns_dict):
         
-        filtered = filter_data(
-            st.session_state.data,
-            st.session_state.columns_dict,
-            st.session_state.selected_main,
-            st.session_state.selected_sub
-        )
+        filtered = get_filtered_selection()
         
         if filtered is not None and len(filtered) > 0:
-            csv = filtered.to_csv(index=False)
-            st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"maintenance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            # Serialize only once asked to - download_button can't take a lazy callable here
+            selection_key = current_selection_key()
+            if st.session_state.export_key != selection_key:
+                if st.button("📦 Prepare CSV"):
+                    st.session_state.export_key = selection_key
+            
+            if st.session_state.export_key == selection_key:
+                st.download_button(
+                    label="📥 Download CSV",
+                    data=selection_csv(selection_key, filtered),
+                    file_name=f"maintenance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv"
+                )
 
 
 
@@ -321,25 +621,36 @@ if not col_dict.get('main'):
 
 
 
-if view_mode == "🔍 Table View":
+@st.fragment
+def render_table_view():
+    """Table View - main/sub selection, preview and stats"""
+    col_dict = st.session_state.columns_dict
+    
     st.header("Data Selection & Preview")
     
     # Get main values
-    main_values = get_main_values(st.session_state.data, col_dict)
+    main_values = get_main_values(st.session_state.data_key, st.session_state.data, col_dict)
     
     if not main_values:
         st.error("❌ No data found in main column")
-        st.stop()
+        return
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("📦 Select Main Category")
-        for val in main_values[:10]:  # Show first 10
-            if st.button(f"📦 {val}", key=f"main_{val}", use_container_width=True):
-                st.session_state.selected_main = val
-                st.session_state.selected_sub = []
-                st.rerun()
+        current = st.session_state.selected_main
+        choice = st.radio(
+            "Main category",
+            options=main_values,
+            index=main_values.index(current) if current in main_values else None,
+            horizontal=True,
+            label_visibility="collapsed",
+            key="main_select"
+        )
+        if choice != st.session_state.selected_main:
+            st.session_state.selected_main = choice
+            st.session_state.selected_sub = []
     
     with col2:
         st.subheader("Selected")
@@ -353,7 +664,7 @@ if view_mode == "🔍 Table View":
     # Sub-category selection
     if st.session_state.selected_main:
         if col_dict.get('sub'):
-            sub_values = get_sub_values(st.session_state.data, col_dict, st.session_state.selected_main)
+            sub_values = get_sub_values(st.session_state.selected_main)
             
             if sub_values:
                 st.subheader("🔹 Select Sub-Categories")
@@ -363,7 +674,10 @@ if view_mode == "🔍 Table View":
                     default=sub_values[0:1] if sub_values else [],
                     key="sub_select"
                 )
-                st.session_state.selected_sub = selected_sub
+                if selected_sub != st.session_state.selected_sub:
+                    # Full rerun so the sidebar export picks up the new selection
+                    st.session_state.selected_sub = selected_sub
+                    st.rerun()
             else:
                 st.warning("No sub-categories found")
         
@@ -371,19 +685,14 @@ if view_mode == "🔍 Table View":
         
         # Display filtered data
         if st.session_state.selected_sub:
-            filtered_df = filter_data(
-                st.session_state.data,
-                col_dict,
-                st.session_state.selected_main,
-                st.session_state.selected_sub
-            )
+            filtered_df = get_filtered_selection()
             
             if filtered_df is not None and len(filtered_df) > 0:
                 st.subheader(f"📊 Data Preview ({len(filtered_df)} records)")
-                st.dataframe(filtered_df, use_container_width=True, height=400)
+                show_preview(filtered_df, height=400, key="table_show_all")
                 
                 # Statistics
-                stats = calculate_stats(filtered_df, col_dict)
+                stats = calculate_stats(current_selection_key(), filtered_df, col_dict)
                 
                 col1, col2, col3, col4 = st.columns(4)
                 with col1:
@@ -400,28 +709,28 @@ if view_mode == "🔍 Table View":
 
 
 
-elif view_mode == "📊 Analytics":
+@st.fragment
+def render_analytics_view():
+    """Analytics - table, time and manpower tabs for the current selection"""
+    col_dict = st.session_state.columns_dict
     
     if not st.session_state.selected_main or not st.session_state.selected_sub:
         st.warning("Please select a category and items first")
-        st.stop()
+        return
     
-    filtered_df = filter_data(
-        st.session_state.data,
-        col_dict,
-        st.session_state.selected_main,
-        st.session_state.selected_sub
-    )
+    filtered_df = get_filtered_selection()
     
     if filtered_df is None or len(filtered_df) == 0:
         st.error("No data found")
-        st.stop()
+        return
+    
+    selection_key = current_selection_key()
     
     tab1, tab2, tab3 = st.tabs(["📋 Table", "⏱️ Time", "👥 Manpower"])
     
     with tab1:
         st.subheader("Complete Data")
-        st.dataframe(filtered_df, use_container_width=True, height=500)
+        show_preview(filtered_df, height=500, key="analytics_show_all")
     
     with tab2:
         st.subheader("Time Analysis")
@@ -430,18 +739,7 @@ elif view_mode == "📊 Analytics":
                 if (col_dict['prep_time'] in filtered_df.columns and 
                     col_dict['activity_time'] in filtered_df.columns):
                     
-                    prep = filtered_df[col_dict['prep_time']].apply(time_str_to_hours)
-                    activity = filtered_df[col_dict['activity_time']].apply(time_str_to_hours)
-                    
-                    component_col = col_dict.get('component', 'Item')
-                    x_axis = filtered_df[component_col] if component_col in filtered_df.columns else range(len(filtered_df))
-                    
-                    fig = go.Figure(data=[
-                        go.Bar(name='Preparation', x=x_axis, y=prep),
-                        go.Bar(name='Activity', x=x_axis, y=activity)
-                    ])
-                    
-                    fig.update_layout(barmode='stack', height=500, hovermode='x unified')
+                    fig = build_time_figure(selection_key, filtered_df, col_dict)
                     st.plotly_chart(fig, use_container_width=True)
             except Exception as e:
                 st.error(f"Could not generate chart: {str(e)}")
@@ -453,17 +751,7 @@ elif view_mode == "📊 Analytics":
         if col_dict.get('manpower'):
             try:
                 if col_dict['manpower'] in filtered_df.columns:
-                    component_col = col_dict.get('component', 'Item')
-                    x_axis = filtered_df[component_col] if component_col in filtered_df.columns else range(len(filtered_df))
-                    
-                    fig = px.bar(
-                        x=x_axis,
-                        y=filtered_df[col_dict['manpower']],
-                        title="Manpower Needed",
-                        color=filtered_df[col_dict['manpower']],
-                        color_continuous_scale='Viridis'
-                    )
-                    fig.update_layout(height=500)
+                    fig = build_manpower_figure(selection_key, filtered_df, col_dict)
                     st.plotly_chart(fig, use_container_width=True)
             except Exception as e:
                 st.error(f"Could not generate chart: {str(e)}")
@@ -472,11 +760,19 @@ elif view_mode == "📊 Analytics":
 # VIEW 3: SUMMARY
 # ============================================================================
 
-elif view_mode == "📈 Summary":
+@st.fragment
+def render_summary_view():
+    """Summary - workbook-wide metrics and per-category breakdown"""
+    import plotly.graph_objects as go
+    
+    col_dict = st.session_state.columns_dict
     
     st.header("Summary Report")
     
-    main_values = get_main_values(st.session_state.data, col_dict)
+    main_values = get_main_values(st.session_state.data_key, st.session_state.data, col_dict)
+    
+    # Workbook-wide totals from the precomputed columns, cached like any selection
+    totals = calculate_stats((st.session_state.data_key,), st.session_state.data, col_dict)
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -485,57 +781,48 @@ elif view_mode == "📈 Summary":
         st.metric("Total Records", len(st.session_state.data))
     with col3:
         if col_dict.get('manpower') and col_dict['manpower'] in st.session_state.data.columns:
-            try:
-                mp = pd.to_numeric(st.session_state.data[col_dict['manpower']], errors='coerce').dropna()
-                st.metric("Total Manpower", int(mp.sum()))
-            except:
-                st.metric("Total Manpower", "N/A")
+            st.metric("Total Manpower", totals['total_manpower'])
     with col4:
         if col_dict.get('total_time') and col_dict['total_time'] in st.session_state.data.columns:
-            try:
-                total_secs = sum(time_str_to_seconds(t) for t in st.session_state.data[col_dict['total_time']])
-                st.metric("Total Time", seconds_to_time_str(int(total_secs)))
-            except:
-                st.metric("Total Time", "N/A")
+            st.metric("Total Time", seconds_to_time_str(int(totals['total_time'])))
     
     st.markdown("---")
     st.subheader("Category Summary")
     
-    summary_data = []
-    for main_val in main_values[:20]:  # Limit to 20
-        try:
-            category_df = st.session_state.data[
-                st.session_state.data[col_dict['main']].astype(str) == str(main_val)
-            ]
-            
-            summary_data.append({
-                'Category': main_val,
-                'Records': len(category_df),
-                'Manpower': int(pd.to_numeric(category_df[col_dict['manpower']], errors='coerce').sum()) 
-                           if col_dict.get('manpower') and col_dict['manpower'] in st.session_state.data.columns 
-                           else 0
-            })
-        except:
-            pass
+    # Built once at upload - no per-category filtering on rerun
+    summary_df = st.session_state.summary_cache.head(20)  # Limit to 20
     
-    if summary_data:
-        summary_df = pd.DataFrame(summary_data)
+    if len(summary_df) > 0:
         st.dataframe(summary_df, use_container_width=True)
         
         try:
-            fig = px.bar(
-                summary_df,
-                x='Category',
-                y='Records',
-                title='Records per Category',
-                color='Manpower',
-                color_continuous_scale='Blues'
-            )
-            fig.update_layout(height=400)
+            # One plain go.Bar trace - skips plotly.express column inference
+            fig = go.Figure(go.Bar(
+                x=summary_df['Category'],
+                y=summary_df['Records'],
+                marker=dict(
+                    color=summary_df['Manpower'],
+                    colorscale='Blues',
+                    showscale=True,
+                    colorbar=dict(title='Manpower')
+                )
+            ))
+            fig.update_layout(title='Records per Category', height=400)
             st.plotly_chart(fig, use_container_width=True)
         except:
             pass
 
+# ============================================================================
+# VIEW DISPATCH
+# ============================================================================
+
+if view_mode == "🔍 Table View":
+    render_table_view()
+elif view_mode == "📊 Analytics":
+    render_analytics_view()
+elif view_mode == "📈 Summary":
+    render_summary_view()
+
 # ============================================================================
 # FOOTER
 # ============================================================================
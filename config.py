@@ -163,6 +163,7 @@ PERFORMANCE = {
     "cache_ttl": 3600,  # Cache time-to-live in seconds
     "max_rows_display": 1000,  # Max rows to display without pagination
     "lazy_load": True,  # Enable lazy loading for large datasets
+    "disk_cache_entries": 20,  # Parsed uploads kept on disk (oldest deleted first)
 }
 
 # ============================================================================
@@ -3,30 +3,48 @@ Data Processing Module
 Handles data loading, validation, and transformation
 """
 
+import io
+import re
 import pandas as pd
 import numpy as np
 from typing import Optional, List, Dict, Tuple
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 
 # ============================================================================
 # COLUMN VALIDATION
 # ============================================================================
 
+PREP_COL = 'Preparation/Finalization (h:mm:ss)'
+ACT_COL = 'Activity (h:mm:ss)'
+TOT_COL = 'Total time (h:mm:ss)'
+MANPOWER_COL = 'No of man power'
+
+# Time column -> prefix of its derived *_time_hours / *_work_hours columns
+TIME_COLUMN_PREFIXES = {
+    PREP_COL: 'prep',
+    ACT_COL: 'activity',
+    TOT_COL: 'total',
+}
+
 REQUIRED_COLUMNS = [
     'S.no',
     'Component',
     'Component.1',
-    'Preparation/Finalization (h:mm:ss)',
-    'Activity (h:mm:ss)',
-    'Total time (h:mm:ss)',
-    'No of man power'
+    PREP_COL,
+    ACT_COL,
+    TOT_COL,
+    MANPOWER_COL
 ]
 
 # ============================================================================
 # DATA LOADING & VALIDATION
 # ============================================================================
 
+def _is_empty(df: Optional[pd.DataFrame]) -> bool:
+    """True for None or a frame without rows (len() skips the shape checks of .empty)."""
+    return df is None or len(df) == 0
+
 def validate_excel_structure(df: pd.DataFrame) -> Tuple[bool, List[str]]:
     """
     Validate that Excel file has required columns.
@@ -42,6 +60,15 @@ def validate_excel_structure(df: pd.DataFrame) -> Tuple[bool, List[str]]:
     
     return len(errors) == 0, errors
 
+# Three fields in the shape int() accepts: surrounding whitespace, a sign, digits
+# with optional underscores ('1 : 02 : 03', '01:005:07' and '-0:01:01' are valid)
+_TIME_FIELD = r'\s*([+-]?\d+(?:_\d+)*)\s*'
+TIME_FORMAT_RE = re.compile(':'.join([_TIME_FIELD] * 3))
+
+def _time_fields_in_range(hours, minutes, seconds):
+    """Hours >= 0, minutes and seconds 0-59 (works on ints and on Series)."""
+    return (hours >= 0) & (minutes >= 0) & (minutes <= 59) & (seconds >= 0) & (seconds <= 59)
+
 def validate_time_format(time_str: str) -> bool:
     """
     Validate that time is in HH:MM:SS format.
@@ -55,19 +82,36 @@ def validate_time_format(time_str: str) -> bool:
     if pd.isna(time_str):
         return False
     
-    try:
-        parts = str(time_str).split(':')
-        if len(parts) != 3:
-            return False
-        
-        hours, minutes, seconds = map(int, parts)
-        
-        if hours < 0 or minutes < 0 or minutes > 59 or seconds < 0 or seconds > 59:
-            return False
-        
-        return True
-    except (ValueError, AttributeError):
+    match = TIME_FORMAT_RE.fullmatch(str(time_str))
+    if match is None:
         return False
+    
+    return bool(_time_fields_in_range(*map(int, match.groups())))
+
+def validate_time_column(series: pd.Series) -> pd.Series:
+    """
+    Validate a whole column of HH:MM:SS values in one vectorized pass.
+    
+    Accepts exactly what validate_time_format accepts.
+    
+    Args:
+        series: Column of time values
+        
+    Returns:
+        Boolean Series, True where the cell is a valid time
+    """
+    fields = series.astype(str).str.extract(rf'\A(?:{TIME_FORMAT_RE.pattern})\Z')
+    matched = fields[0].notna() & series.notna()
+    
+    numbers = fields.apply(lambda col: pd.to_numeric(col.str.replace('_', ''), errors='coerce'))
+    valid = (matched & _time_fields_in_range(numbers[0], numbers[1], numbers[2])).to_numpy(copy=True)
+    
+    # Non-ASCII digits match the pattern but not to_numeric - check those few per cell
+    unparsed = (matched & numbers.isna().any(axis=1)).to_numpy()
+    if unparsed.any():
+        valid[unparsed] = [validate_time_format(value) for value in series[unparsed]]
+    
+    return pd.Series(valid, index=series.index)
 
 def validate_manpower(value) -> bool:
     """Validate that manpower is a positive integer."""
@@ -114,9 +158,8 @@ def seconds_to_time_str(seconds: int) -> str:
     Returns:
         Formatted time string
     """
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
     
     return f"{hours:02d}:{minutes:02d}:{secs:02d}"
 
@@ -128,6 +171,56 @@ def time_str_to_minutes(time_str: str) -> float:
     """Convert HH:MM:SS to minutes."""
     return time_str_to_seconds(time_str) / 60
 
+def parse_hms_vec(series: pd.Series) -> pd.Series:
+    """
+    Vectorized H:MM:SS parse with the same field rules as time_str_to_seconds.
+    
+    Uses TIME_FORMAT_RE, so each field is whatever int() accepts (whitespace,
+    a sign, underscores between digits) and hours may exceed 23.
+    
+    Args:
+        series: Column of time values
+        
+    Returns:
+        Seconds as float Series (NaN where the cell isn't three integer fields)
+    """
+    fields = series.astype(str).str.extract(rf'\A(?:{TIME_FORMAT_RE.pattern})\Z')
+    parts = fields.apply(lambda col: col.str.replace('_', '')).astype('float64')
+    
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+def time_col_to_seconds(series: pd.Series) -> pd.Series:
+    """
+    Convert a whole HH:MM:SS column to seconds in one vectorized pass.
+    
+    Text cells follow time_str_to_seconds / validate_time_format (three int
+    fields); anything else, e.g. '1 days' or '01:02:03.5', counts as 0.
+    datetime.time / timedelta cells are converted with pd.to_timedelta.
+    
+    Args:
+        series: Column of time values (strings, datetime.time, timedelta)
+        
+    Returns:
+        Seconds as float Series, invalid cells -> 0
+    """
+    if pd.api.types.is_timedelta64_dtype(series):
+        # timedelta64 input (e.g. read from Parquet) - no string work at all
+        return series.dt.total_seconds().fillna(0)
+    
+    seconds = parse_hms_vec(series)
+    
+    # Object columns from openpyxl/calamine can hold real time / timedelta cells
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+        is_time = series.map(lambda value: isinstance(value, (time, timedelta))).to_numpy(dtype=bool)
+        if is_time.any():
+            cells = [v.isoformat() if isinstance(v, time) else v for v in series[is_time]]
+            # Assign by position - index alignment fails on duplicate labels
+            values = seconds.to_numpy(copy=True)
+            values[is_time] = pd.to_timedelta(cells, errors='coerce').total_seconds()
+            seconds = pd.Series(values, index=series.index)
+    
+    return seconds.fillna(0)
+
 # ============================================================================
 # DATA EXTRACTION
 # ============================================================================
@@ -139,7 +232,7 @@ def get_main_components(df: pd.DataFrame) -> List[str]:
     Returns:
         Sorted list of component names
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return []
     
     return sorted(df['Component'].dropna().unique().tolist())
@@ -155,7 +248,7 @@ def get_sub_components(df: pd.DataFrame, main_component: str) -> List[str]:
     Returns:
         Sorted list of sub-component names
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return []
     
     filtered = df[df['Component'] == main_component]
@@ -217,7 +310,7 @@ def calculate_summary_stats(df: pd.DataFrame) -> Dict:
     Returns:
         Dictionary with calculated metrics
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return {
             'total_sub_components': 0,
             'total_preparation_time': 0,
@@ -229,21 +322,23 @@ def calculate_summary_stats(df: pd.DataFrame) -> Dict:
             'min_manpower': 0,
         }
     
-    total_prep = sum(time_str_to_seconds(t) for t in df['Preparation/Finalization (h:mm:ss)'])
-    total_activity = sum(time_str_to_seconds(t) for t in df['Activity (h:mm:ss)'])
-    total_time = sum(time_str_to_seconds(t) for t in df['Total time (h:mm:ss)'])
+    total_prep = int(time_col_to_seconds(df[PREP_COL]).sum())
+    total_activity = int(time_col_to_seconds(df[ACT_COL]).sum())
+    total_time = int(time_col_to_seconds(df[TOT_COL]).sum())
     
-    manpower_values = df['No of man power'].dropna()
+    # All manpower reductions in one agg call (NaN skipped, no dropna copy)
+    manpower = df[MANPOWER_COL].agg(['count', 'sum', 'mean', 'max', 'min'])
+    has_manpower = manpower['count'] > 0
     
     return {
         'total_sub_components': len(df),
         'total_preparation_time': total_prep,
         'total_activity_time': total_activity,
         'total_time': total_time,
-        'avg_manpower': manpower_values.mean() if len(manpower_values) > 0 else 0,
-        'total_manpower': int(manpower_values.sum()) if len(manpower_values) > 0 else 0,
-        'max_manpower': int(manpower_values.max()) if len(manpower_values) > 0 else 0,
-        'min_manpower': int(manpower_values.min()) if len(manpower_values) > 0 else 0,
+        'avg_manpower': manpower['mean'] if has_manpower else 0,
+        'total_manpower': int(manpower['sum']) if has_manpower else 0,
+        'max_manpower': int(manpower['max']) if has_manpower else 0,
+        'min_manpower': int(manpower['min']) if has_manpower else 0,
     }
 
 def calculate_component_summary(df: pd.DataFrame) -> pd.DataFrame:
@@ -253,13 +348,16 @@ def calculate_component_summary(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         Dataframe with component aggregates
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return pd.DataFrame()
     
-    summary = df.groupby('Component').agg({
-        'Component.1': 'count',
-        'No of man power': ['sum', 'mean', 'max'],
-    }).round(2)
+    # One grouped pass, flat column names, groups kept in first-seen order
+    summary = df.groupby('Component', sort=False, observed=True).agg(
+        sub_components=('Component.1', 'count'),
+        total_manpower=(MANPOWER_COL, 'sum'),
+        avg_manpower=(MANPOWER_COL, 'mean'),
+        max_manpower=(MANPOWER_COL, 'max'),
+    ).round(2)
     
     return summary
 
@@ -274,53 +372,85 @@ def add_calculated_columns(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         Dataframe with new columns
     """
-    df = df.copy()
+    # Convert times to different units (whole-column parse, no per-row apply)
+    hours = np.column_stack([
+        time_col_to_seconds(df[col]).to_numpy() / 3600 for col in TIME_COLUMN_PREFIXES
+    ])
     
-    # Convert times to different units
-    df['prep_time_hours'] = df['Preparation/Finalization (h:mm:ss)'].apply(time_str_to_hours)
-    df['activity_time_hours'] = df['Activity (h:mm:ss)'].apply(time_str_to_hours)
-    df['total_time_hours'] = df['Total time (h:mm:ss)'].apply(time_str_to_hours)
+    # Calculate work-hours (person-hours) for all three columns in one broadcast multiply
+    work_hours = hours * df[MANPOWER_COL].to_numpy(dtype='float64', na_value=np.nan)[:, None]
     
-    # Calculate work-hours (person-hours)
-    df['prep_work_hours'] = df['prep_time_hours'] * df['No of man power']
-    df['activity_work_hours'] = df['activity_time_hours'] * df['No of man power']
-    df['total_work_hours'] = df['total_time_hours'] * df['No of man power']
+    prefixes = list(TIME_COLUMN_PREFIXES.values())
+    derived = pd.DataFrame(
+        np.hstack([hours, work_hours]),
+        columns=[f'{p}_time_hours' for p in prefixes] + [f'{p}_work_hours' for p in prefixes],
+        index=df.index
+    )
     
-    return df
+    # One concat builds the new frame - no full df.copy() followed by six inserts.
+    # Replace derived columns from an earlier call instead of duplicating them.
+    return pd.concat([df.drop(columns=derived.columns, errors='ignore'), derived], axis=1)
 
 # ============================================================================
 # DATA EXPORT
 # ============================================================================
 
+ARROW_CSV_TYPES = {'string', 'categorical', 'integer', 'floating', 'mixed-integer-float', 'boolean', 'empty'}
+
+
 def prepare_export_csv(df: pd.DataFrame, filename: str = "export.csv") -> str:
     """
     Prepare CSV export of dataframe.
     
+    Frames with only text/numeric/boolean/categorical columns are written with
+    pyarrow's CSV writer, which formats values slightly differently from to_csv:
+    the header and string fields are quoted, booleans are true/false and
+    whole-number floats lose their ".0" (1.0 -> 1). The values read back the same.
+    Other frames, or any without pyarrow, use to_csv.
+    
     Returns:
         CSV string content
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return ""
     
+    # Arrow prints times and timedeltas differently - only take it for plain columns
+    if all(pd.api.types.infer_dtype(df[col], skipna=True) in ARROW_CSV_TYPES for col in df.columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+        except ImportError:
+            pa = None
+        
+        if pa is not None:
+            try:
+                buffer = pa.BufferOutputStream()
+                pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+                return buffer.getvalue().to_pybytes().decode('utf-8')
+            except (pa.ArrowException, OverflowError):
+                pass  # Column Arrow can't convert - fall back to pandas
+    
     return df.to_csv(index=False)
 
 def prepare_export_excel(df: pd.DataFrame, filename: str = "export.xlsx") -> bytes:
     """
     Prepare Excel export of dataframe.
     
+    The workbook is written to memory; filename is kept for callers but
+    nothing touches the disk (no clashes between concurrent sessions).
+    
     Returns:
         Excel file bytes
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return b""
     
     # Note: Requires openpyxl
-    output = pd.ExcelWriter(filename, engine='openpyxl')
-    df.to_excel(output, sheet_name='Data', index=False)
-    output.close()
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as output:
+        df.to_excel(output, sheet_name='Data', index=False)
     
-    with open(filename, 'rb') as f:
-        return f.read()
+    return buffer.getvalue()
 
 # ============================================================================
 # ANALYSIS FUNCTIONS
@@ -335,15 +465,17 @@ def find_bottlenecks(df: pd.DataFrame, threshold: float = 2.0) -> pd.DataFrame:
         threshold: Time threshold in hours
         
     Returns:
-        Dataframe with bottleneck components
+        Dataframe with bottleneck components (plus total_time_hours), longest first
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return pd.DataFrame()
     
-    df_copy = add_calculated_columns(df.copy())
-    bottlenecks = df_copy[df_copy['total_time_hours'] > threshold]
+    # Only the total time is needed - skip building the other derived columns
+    hours = time_col_to_seconds(df[TOT_COL]).to_numpy() / 3600
+    positions = np.flatnonzero(hours > threshold)
+    positions = positions[np.argsort(-hours[positions], kind='stable')]
     
-    return bottlenecks.sort_values('total_time_hours', ascending=False)
+    return df.iloc[positions].assign(total_time_hours=hours[positions])
 
 def find_high_manpower_tasks(df: pd.DataFrame, threshold: int = 2) -> pd.DataFrame:
     """
@@ -356,13 +488,15 @@ def find_high_manpower_tasks(df: pd.DataFrame, threshold: int = 2) -> pd.DataFra
     Returns:
         Dataframe with high-manpower tasks
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return pd.DataFrame()
     
-    return df[df['No of man power'] >= threshold].sort_values(
-        'No of man power',
-        ascending=False
-    )
+    # Filter and order on the raw array, then materialize the rows once
+    manpower = df[MANPOWER_COL].to_numpy(dtype='float64', na_value=np.nan)
+    positions = np.flatnonzero(manpower >= threshold)
+    positions = positions[np.argsort(-manpower[positions], kind='stable')]
+    
+    return df.take(positions)
 
 def efficiency_analysis(df: pd.DataFrame) -> Dict:
     """
@@ -371,48 +505,70 @@ def efficiency_analysis(df: pd.DataFrame) -> Dict:
     Returns:
         Dictionary with efficiency metrics
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return {}
     
-    df_copy = add_calculated_columns(df.copy())
+    # Straight from the total-time and manpower arrays - no augmented frame
+    hours = time_col_to_seconds(df[TOT_COL]).to_numpy() / 3600
+    manpower = df[MANPOWER_COL].to_numpy(dtype='float64', na_value=np.nan)
+    
+    total_hours = hours.sum()
+    total_work_hours = np.nansum(hours * manpower)
     
     return {
-        'avg_time_per_component': df_copy['total_time_hours'].mean(),
-        'avg_manpower_per_component': df_copy['No of man power'].mean(),
-        'total_work_hours': df_copy['total_work_hours'].sum(),
-        'efficiency_ratio': df_copy['total_time_hours'].sum() / df_copy['total_work_hours'].sum(),
+        'avg_time_per_component': total_hours / len(hours),
+        'avg_manpower_per_component': df[MANPOWER_COL].mean(),
+        'total_work_hours': total_work_hours,
+        # No work hours (blank manpower or zero times) - no meaningful ratio
+        'efficiency_ratio': total_hours / total_work_hours if total_work_hours else None,
     }
 
 # ============================================================================
 # REPORT GENERATION
 # ============================================================================
 
-def generate_summary_report(df: pd.DataFrame, component_name: str = None) -> str:
+REPORT_HEADER = """
+    ╔════════════════════════════════════════╗
+    ║     COMPONENT SUMMARY REPORT           ║
+    ╠════════════════════════════════════════╣
+    """
+
+REPORT_COMPONENT_LINE = "║ Component: {component_name:<29}║\n"
+
+REPORT_BODY = """║ Total Sub-Components: {total_sub_components:<18}║
+    ║ Total Manpower: {total_manpower:<23}║
+    ║ Avg Manpower: {avg_manpower:<25.1f}║
+    ║ Total Time: {total_time_str:<26}║
+    ╚════════════════════════════════════════╝
+    """
+
+def generate_summary_report(df: pd.DataFrame, component_name: str = None,
+                            stats: Optional[Dict] = None) -> str:
     """
     Generate text summary report.
     
+    Args:
+        df: Dataframe to report on
+        component_name: Optional component shown in the header
+        stats: Precomputed calculate_summary_stats(df) result, to avoid recomputing it
+        
     Returns:
         Formatted report string
     """
-    if df is None or df.empty:
+    if _is_empty(df):
         return "No data to generate report"
     
-    stats = calculate_summary_stats(df)
+    if stats is None:
+        stats = calculate_summary_stats(df)
     
-    report = f"""
-    ╔════════════════════════════════════════╗
-    ║     COMPONENT SUMMARY REPORT           ║
-    ╠════════════════════════════════════════╣
-    """
+    parts = [REPORT_HEADER]
     
     if component_name:
-        report += f"║ Component: {component_name:<29}║\n"
+        parts.append(REPORT_COMPONENT_LINE.format_map({'component_name': component_name}))
     
-    report += f"""║ Total Sub-Components: {stats['total_sub_components']:<18}║
-    ║ Total Manpower: {stats['total_manpower']:<23}║
-    ║ Avg Manpower: {stats['avg_manpower']:.1f:<25}║
-    ║ Total Time: {seconds_to_time_str(int(stats['total_time'])):<26}║
-    ╚════════════════════════════════════════╝
-    """
+    parts.append(REPORT_BODY.format_map({
+        **stats,
+        'total_time_str': seconds_to_time_str(int(stats['total_time'])),
+    }))
     
-    return report
+    return "".join(parts)
@@ -0,0 +1,171 @@
+"""
+Streamlit app tests
+Runs app.py headlessly with AppTest and a fake upload
+"""
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+CACHE_VERSION = re.search(r'^PARQUET_CACHE_VERSION = (\d+)', Path(APP_PATH).read_text(), re.M).group(1)
+
+HEADERS = [
+    'S.no',
+    'Module',
+    'Sub Module',
+    'Component',
+    'Preparation/Finalization (h:mm:ss)',
+    'Activity (h:mm:ss)',
+    'Total time (h:mm:ss)',
+    'No of man power',
+]
+
+
+def setUpModule():
+    # Keep the app's on-disk parse cache out of the real home directory
+    global _home
+    _home = tempfile.TemporaryDirectory()
+    patcher = mock.patch.dict(os.environ, {'HOME': _home.name})
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+    unittest.addModuleCleanup(_home.cleanup)
+
+
+def cache_dir():
+    return Path(os.environ['HOME']) / '.cache' / 'kone_maintenance'
+
+
+def make_workbook(rows):
+    """Excel bytes with the standard headers and the given rows"""
+    buffer = io.BytesIO()
+    pd.DataFrame(rows, columns=HEADERS).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+class FakeUpload(io.BytesIO):
+    """Stands in for the UploadedFile returned by st.file_uploader"""
+    name = 'upload.xlsx'
+
+    def __init__(self, data, file_id):
+        super().__init__(data)
+        self.file_id = file_id
+
+
+def run_app(workbook, view="🔍 Table View"):
+    """Run the app with workbook uploaded and the given view selected"""
+    upload = FakeUpload(workbook, file_id=f"test-{hash(workbook)}")
+    with mock.patch('streamlit.file_uploader', return_value=upload):
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.run()
+        view_radio = next(r for r in at.radio if r.label == "Select View")
+        view_radio.set_value(view).run()
+    return at
+
+
+def metrics(at):
+    return {m.label: m.value for m in at.metric}
+
+
+class TestSummaryView(unittest.TestCase):
+
+    def test_headers_only_workbook(self):
+        at = run_app(make_workbook([]), view="📈 Summary")
+
+        self.assertEqual(list(at.exception), [])
+        self.assertEqual(metrics(at)['Total Records'], '0')
+        self.assertEqual(metrics(at)['Total Manpower'], '0')
+        self.assertEqual(metrics(at)['Total Time'], '00:00:00')
+
+    def test_workbook_totals(self):
+        rows = [
+            [1, 'Car', 'Door', 'Motor', '0:10:00', '0:20:00', '0:30:00', 2],
+            [2, 'Car', 'Roof', 'Fan', '0:05:00', '1:00:00', '1:05:00', 3],
+        ]
+        at = run_app(make_workbook(rows), view="📈 Summary")
+
+        self.assertEqual(list(at.exception), [])
+        self.assertEqual(metrics(at)['Total Records'], '2')
+        self.assertEqual(metrics(at)['Total Manpower'], '5')
+        self.assertEqual(metrics(at)['Total Time'], '01:35:00')
+
+
+    def test_huge_times_do_not_wrap(self):
+        rows = [
+            [1, 'Car', 'Door', 'Motor', '0:00:00', '999999:00:00', '999999:00:00', 1],
+            [2, 'Car', 'Roof', 'Fan', '0:00:00', '1:00:00', '1:00:00', 1],
+        ]
+        at = run_app(make_workbook(rows), view="📈 Summary")
+
+        self.assertEqual(list(at.exception), [])
+        self.assertEqual(metrics(at)['Total Time'], '1000000:00:00')
+
+
+class TestTableView(unittest.TestCase):
+
+    def test_preview_keeps_undetected_columns(self):
+        rows = [
+            [1, 'Car', 'Door', 'Motor', '0:10:00', '0:20:00', '0:30:00', 2],
+            [2, 'Car', 'Door', 'Lock', '0:05:00', '0:10:00', '0:15:00', 1],
+        ]
+        workbook = pd.DataFrame(rows, columns=HEADERS).assign(Remarks=['check oil', 5])
+        buffer = io.BytesIO()
+        workbook.to_excel(buffer, index=False)
+
+        at = run_app(buffer.getvalue())
+        next(r for r in at.radio if r.label == "Main category").set_value('Car').run()
+
+        self.assertEqual(list(at.exception), [])
+        preview = at.dataframe[0].value
+        self.assertEqual(list(preview.columns), HEADERS + ['Remarks'])
+        self.assertEqual(preview['S.no'].tolist(), [1, 2])
+
+
+class TestParquetCache(unittest.TestCase):
+
+    ROWS = [
+        [1, 'Car', 'Door', 'Motor', '0:10:00', '0:20:00', '0:30:00', 4],
+        [2, 'Car', 'Roof', 'Fan', '0:05:00', '1:00:00', '1:05:00', 1],
+        [3, 'Pit', 'Buffer', 'Spring', '0:05:00', '0:05:00', '0:10:00', 1],
+    ]
+
+    def test_older_cache_version_is_ignored_and_deleted(self):
+        workbook = make_workbook(self.ROWS)
+        data_key = hashlib.blake2b(workbook, digest_size=16).hexdigest()
+
+        # A file in an older cache format with different contents
+        cache_dir().mkdir(parents=True, exist_ok=True)
+        stale = cache_dir() / f"kone_v1_{data_key}.parquet"
+        stale_df = pd.DataFrame({'Module': ['Old']})
+        stale_df.attrs['columns_dict'] = {'main': 'Module'}
+        stale_df.to_parquet(stale)
+
+        at = run_app(workbook, view="📈 Summary")
+
+        self.assertEqual(list(at.exception), [])
+        self.assertEqual(metrics(at)['Total Records'], '3')
+        self.assertEqual(metrics(at)['Total Manpower'], '6')
+        self.assertFalse(stale.exists())
+        self.assertEqual(len(list(cache_dir().glob(f"kone_v*_{data_key}.parquet"))), 1)
+
+    def test_expired_entries_are_deleted(self):
+        cache_dir().mkdir(parents=True, exist_ok=True)
+        expired = cache_dir() / f"kone_v{CACHE_VERSION}_expired.parquet"
+        expired.write_bytes(b"")
+        os.utime(expired, (0, 0))
+
+        run_app(make_workbook(self.ROWS[:2]))
+
+        self.assertFalse(expired.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
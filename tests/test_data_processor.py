@@ -0,0 +1,165 @@
+"""
+Data processor tests
+"""
+
+import io
+import sys
+import unittest
+from datetime import time, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import data_processor as dp
+
+
+def make_frame(times, manpower, index=None):
+    """Frame with the standard time/manpower columns, total time = times"""
+    return pd.DataFrame({
+        'Component': ['Car'] * len(times),
+        'Component.1': [f'Sub {i}' for i in range(len(times))],
+        dp.PREP_COL: times,
+        dp.ACT_COL: times,
+        dp.TOT_COL: times,
+        dp.MANPOWER_COL: manpower,
+    }, index=index)
+
+
+class TestValidateTimeFormat(unittest.TestCase):
+
+    # Same rules as the original split(':') / int() check
+    VALID = ['0:00:00', '01:02:03', '100:59:59', '0:1:2', '01:005:07', '1 : 02 : 03',
+             ' 1:02:03 ', '-0:01:01', '+1:+2:+3', '1_0:00:00', '１:００:００', time(1, 2, 3)]
+    INVALID = ['0:60:00', '0:00:60', '-1:00:00', '1:2', '1:2:3:4', '', 'a:b:c',
+               '1.0:00:00', '1__0:00:00', ':1:1', '１:６０:００', None, np.nan]
+
+    def test_scalar(self):
+        for value in self.VALID:
+            self.assertTrue(dp.validate_time_format(value), value)
+        for value in self.INVALID:
+            self.assertFalse(dp.validate_time_format(value), value)
+
+    def test_column_matches_scalar(self):
+        series = pd.Series(self.VALID + self.INVALID, dtype=object)
+        expected = [True] * len(self.VALID) + [False] * len(self.INVALID)
+        self.assertEqual(dp.validate_time_column(series).tolist(), expected)
+
+
+class TestTimeStrToSeconds(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(dp.time_str_to_seconds('1:02:03'), 3723)
+        self.assertEqual(dp.time_str_to_seconds('bad'), 0)
+        self.assertEqual(dp.time_str_to_seconds(None), 0)
+
+    def test_unhashable_input(self):
+        self.assertEqual(dp.time_str_to_seconds(['1:02:03']), 0)
+
+
+class TestParseHmsVec(unittest.TestCase):
+
+    def test_matches_time_str_to_seconds(self):
+        cells = ['0:01:00', '25:00:00', '0:75:00', ' 1 : 02 : 03 ', '1_0:00:00', '-0:01:01',
+                 '+1:+2:+3', '１:００:００', '1.5:00:00', '1:2', '1__0:00:00', 'bad']
+        result = dp.parse_hms_vec(pd.Series(cells)).fillna(0)
+        self.assertEqual(result.tolist(), [dp.time_str_to_seconds(cell) for cell in cells])
+
+
+class TestTimeColToSeconds(unittest.TestCase):
+
+    def test_mixed_formats(self):
+        series = pd.Series(['0:01:00', '25:00:00', '1 : 02 : 03', '１:００:００', None, 'bad'])
+        result = dp.time_col_to_seconds(series)
+        self.assertEqual(result.tolist(), [60, 90000, 3723, 3600, 0, 0])
+
+    def test_text_follows_validator(self):
+        # Cells validate_time_format rejects count as 0; the ones it accepts are parsed
+        cells = {
+            '1 days': 0,
+            '1h': 0,
+            '1:00:00 PM': 0,
+            '01:02:03.5': 0,
+            '2 days 01:00:00': 0,
+            '-0:01:01': 61,
+            '1_0:00:00': 36000,
+        }
+        result = dp.time_col_to_seconds(pd.Series(list(cells)))
+        self.assertEqual(result.tolist(), list(cells.values()))
+        for cell, seconds in cells.items():
+            self.assertEqual(dp.time_str_to_seconds(cell), seconds, cell)
+
+    def test_time_and_timedelta_cells(self):
+        series = pd.Series([time(1, 2, 3), timedelta(days=1, hours=1), pd.Timedelta(minutes=5),
+                            time(0, 0, 1, 500000), '0:01:00', None])
+        result = dp.time_col_to_seconds(series)
+        self.assertEqual(result.tolist(), [3723, 90000, 300, 1.5, 60, 0])
+
+    def test_timedelta_column(self):
+        series = pd.to_timedelta(pd.Series(['1:00:00', None]))
+        self.assertEqual(dp.time_col_to_seconds(series).tolist(), [3600, 0])
+
+    def test_duplicate_index(self):
+        # e.g. pd.concat of two sheets without ignore_index
+        series = pd.Series(['0:01:00', time(1, 0, 0), 'bad', timedelta(seconds=30)], index=[0, 1, 0, 1])
+        result = dp.time_col_to_seconds(series)
+        self.assertEqual(result.tolist(), [60, 3600, 0, 30])
+        self.assertEqual(result.index.tolist(), [0, 1, 0, 1])
+
+    def test_duplicate_index_frame_helpers(self):
+        df = make_frame([time(0, 30), time(1, 0), '0:15:00'], [2, 1, 4], index=[0, 0, 1])
+        self.assertEqual(dp.calculate_summary_stats(df)['total_time'], 6300)
+        self.assertEqual(dp.add_calculated_columns(df)['total_work_hours'].tolist(), [1.0, 1.0, 1.0])
+
+
+class TestAddCalculatedColumns(unittest.TestCase):
+
+    def test_hours_and_work_hours(self):
+        result = dp.add_calculated_columns(make_frame(['0:30:00', '2:00:00'], [2, np.nan]))
+        self.assertEqual(result['total_time_hours'].tolist(), [0.5, 2.0])
+        self.assertEqual(result['total_work_hours'].tolist()[0], 1.0)
+        self.assertTrue(np.isnan(result['total_work_hours'].tolist()[1]))
+
+    def test_recalculating_replaces_columns(self):
+        df = dp.add_calculated_columns(make_frame(['0:30:00'], [2]))
+        df[dp.MANPOWER_COL] = 4
+        result = dp.add_calculated_columns(df)
+        self.assertFalse(result.columns.duplicated().any())
+        self.assertEqual(result['total_work_hours'].tolist(), [2.0])
+
+
+class TestPrepareExportCsv(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'name': ['Motor', 'Door, left', np.nan],
+            'count': [1, 2, 3],
+            'hours': [1.0, 2.5, np.nan],
+            'ok': [True, False, True],
+        })
+
+    def test_arrow_format(self):
+        csv = dp.prepare_export_csv(self.df)
+        self.assertEqual(csv.splitlines(), [
+            '"name","count","hours","ok"',
+            '"Motor",1,1,true',
+            '"Door, left",2,2.5,false',
+            ',3,,true',
+        ])
+        pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(csv)), self.df)
+
+    def test_without_pyarrow(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.csv': None}):
+            csv = dp.prepare_export_csv(self.df)
+        self.assertEqual(csv, self.df.to_csv(index=False))
+
+    def test_time_objects_use_pandas(self):
+        df = self.df.assign(start=[time(1, 2, 3), None, time(0, 0, 5)])
+        self.assertEqual(dp.prepare_export_csv(df), df.to_csv(index=False))
+
+    def test_empty(self):
+        self.assertEqual(dp.prepare_export_csv(self.df.iloc[0:0]), "")
+
+
+if __name__ == '__main__':
+    unittest.main()